@@ -1,8 +1,17 @@
+import json
+import re
 import streamlit as st
+from array import array
 from collections import defaultdict, deque
-import graphviz
+from itertools import count
 
 
+FINAL_STATE = "Final"
+EPSILON = "ε"
+OPTION_PATTERN = re.compile(r"(ε)|([a-z](?:\s*[a-z])*)?(?:\s*([A-Z]))?")
+NON_TERMINAL_PATTERN = re.compile(r"[A-Z]")
+CACHE_ENTRIES = 32
+
 # Function to convert grammar to NDFA
 def grammar_to_ndfa(grammar):
     rules = grammar.split(":")
@@ -15,28 +24,53 @@ def grammar_to_ndfa(grammar):
     }
 
     for rule in rules:
-        if "->" in rule:
-            lhs, rhs = rule.split("->")
-            lhs = lhs.strip()
-            rhs_options = rhs.split("|")
-
-            ndfa["states"].add(lhs)
-            for option in rhs_options:
-                option = option.strip()
-                for char in option:
-                    if char.islower():
-                        ndfa["alphabet"].add(char)
-
-                for char in option:
-                    if char.islower():
-                        ndfa["transitions"][lhs].add(char)
-                    elif char.isupper():
-                        ndfa["transitions"][lhs].add(char)
-
-            if "ε" in option:
+        if not rule.strip():
+            continue
+        if "->" not in rule:
+            raise ValueError(f"Production '{rule.strip()}' has no '->'")
+
+        lhs, rhs = rule.split("->", 1)
+        lhs = lhs.strip()
+        if not NON_TERMINAL_PATTERN.fullmatch(lhs):
+            raise ValueError(f"Left-hand side '{lhs}' must be a single non-terminal")
+        if ndfa["start_state"] is None:
+            ndfa["start_state"] = lhs
+        rhs_options = rhs.split("|")
+
+        ndfa["states"].add(lhs)
+        for option in rhs_options:
+            option = option.strip()
+            match = OPTION_PATTERN.fullmatch(option)
+            if match is None or not any(match.groups()):
+                raise ValueError(
+                    f"Option '{option}' of {lhs} must be ε, or terminals followed by at most one non-terminal"
+                )
+            epsilon, terminals, target = match.groups()
+
+            if epsilon:
                 ndfa["accept_states"].add(lhs)
+                continue
+
+            target = target or FINAL_STATE
+            ndfa["states"].add(target)
+            if not terminals:
+                ndfa["transitions"][(lhs, EPSILON)].add(target)
+                continue
+
+            terminals = "".join(terminals.split())
+            ndfa["alphabet"].update(terminals)
+            state = lhs
+            for idx, char in enumerate(terminals):
+                next_state = target if idx == len(terminals) - 1 else f"{lhs}_{terminals[:idx + 1]}"
+                ndfa["states"].add(next_state)
+                ndfa["transitions"][(state, char)].add(next_state)
+                state = next_state
 
-    ndfa["start_state"] = rules[0].split("->")[0].strip()
+            if target == FINAL_STATE:
+                ndfa["accept_states"].add(FINAL_STATE)
+
+    if ndfa["start_state"] is None:
+        raise ValueError("Grammar has no productions")
 
     return ndfa
 
@@ -50,166 +84,424 @@ def ndfa_to_dfa(ndfa):
         "accept_states": set()
     }
 
+    nid = {state: idx for idx, state in enumerate(ndfa["states"] | {ndfa["start_state"]})}
+
+    epsilon_moves = defaultdict(list)
+    for (state, char), targets in ndfa["transitions"].items():
+        if char == EPSILON:
+            epsilon_moves[nid[state]].extend(nid[target] for target in targets)
+
+    closure = []
+    for idx in range(len(nid)):
+        mask = 1 << idx
+        stack = [idx]
+        while stack:
+            for target in epsilon_moves[stack.pop()]:
+                if not mask >> target & 1:
+                    mask |= 1 << target
+                    stack.append(target)
+        closure.append(mask)
+
+    succ = {char: [0] * len(nid) for char in dfa["alphabet"]}
+    for (state, char), targets in ndfa["transitions"].items():
+        if char != EPSILON:
+            mask = 0
+            for target in targets:
+                mask |= closure[nid[target]]
+            succ[char][nid[state]] = mask
+
+    accept_mask = 0
+    for state in ndfa["accept_states"]:
+        accept_mask |= 1 << nid[state]
+
     state_map = {}
-    new_state = frozenset([ndfa["start_state"]])
-    state_map[new_state] = 'Q0'
-    dfa["states"].add('Q0')
+    state_numbers = count()
+    new_state = closure[nid[ndfa["start_state"]]]
+    state_map[new_state] = f"Q{next(state_numbers)}"
+    dfa["states"].add(state_map[new_state])
 
     unprocessed_states = deque([new_state])
 
+    succ_items = list(succ.items())
+    state_map_get = state_map.get
+    add_state = dfa["states"].add
+    transitions = dfa["transitions"]
+    popleft = unprocessed_states.popleft
+    append = unprocessed_states.append
+
     while unprocessed_states:
-        current = unprocessed_states.popleft()
+        current = popleft()
         current_state_name = state_map[current]
 
-        for char in dfa["alphabet"]:
-            next_states = set()
-            for state in current:
-                if state in ndfa["transitions"] and char in ndfa["transitions"][state]:
-                    next_states.update(ndfa["transitions"][state])
-
-            if next_states:
-                next_state_name = frozenset(next_states)
-                if next_state_name not in state_map:
-                    state_map[next_state_name] = f"Q{len(state_map)}"
-                    dfa["states"].add(state_map[next_state_name])
-                    unprocessed_states.append(next_state_name)
-                dfa["transitions"][(current_state_name, char)] = state_map[next_state_name]
-
-    for state in state_map.keys():
-        if any(s in ndfa["accept_states"] for s in state):
-            dfa["accept_states"].add(state_map[state])
+        for char, succ_char in succ_items:
+            next_state = 0
+            remaining = current
+            while remaining:
+                next_state |= succ_char[(remaining & -remaining).bit_length() - 1]
+                remaining &= remaining - 1
+
+            if next_state:
+                next_state_name = state_map_get(next_state)
+                if next_state_name is None:
+                    next_state_name = state_map[next_state] = f"Q{next(state_numbers)}"
+                    add_state(next_state_name)
+                    append(next_state)
+                transitions[(current_state_name, char)] = next_state_name
+
+    for state, name in state_map.items():
+        if state & accept_mask:
+            dfa["accept_states"].add(name)
 
     dfa["start_state"] = 'Q0'
 
     return dfa
 
-# Function to minimize the DFA
+# Function to remove the states that cannot be reached from the start state
+def prune_unreachable(dfa):
+    reachable = {dfa["start_state"]}
+    queue = deque(reachable)
+    while queue:
+        state = queue.popleft()
+        for char in dfa["alphabet"]:
+            target = dfa["transitions"].get((state, char))
+            if target is not None and target not in reachable:
+                reachable.add(target)
+                queue.append(target)
+
+    if len(reachable) == len(dfa["states"]):
+        return dfa
+
+    return {
+        "states": reachable,
+        "alphabet": dfa["alphabet"],
+        "transitions": {key: target for key, target in dfa["transitions"].items() if key[0] in reachable},
+        "start_state": dfa["start_state"],
+        "accept_states": dfa["accept_states"] & reachable
+    }
+
+# Function to create a refinable partition of range(size) with a single set
+def make_partition(size):
+    partition = {
+        "count": 1 if size else 0,
+        "elements": array("i", range(size)),
+        "location": array("i", range(size)),
+        "set_of": array("i", [0]) * size,
+        "first": array("i", [0]) * size,
+        "end": array("i", [0]) * size,
+        "mid": array("i", [0]) * size,
+        "touched": []
+    }
+    if size:
+        partition["end"][0] = size
+    return partition
+
+# Function to move an element into the marked prefix of its set
+def mark_element(partition, element):
+    elements, location, mid = partition["elements"], partition["location"], partition["mid"]
+    block = partition["set_of"][element]
+    i, j = location[element], mid[block]
+    if i < j:
+        return
+    if j == partition["first"][block]:
+        partition["touched"].append(block)
+
+    other = elements[j]
+    elements[i], location[other] = other, i
+    elements[j], location[element] = element, j
+    mid[block] = j + 1
+
+# Function to split every touched set into its marked and unmarked elements
+def split_partition(partition):
+    elements, set_of = partition["elements"], partition["set_of"]
+    first, end, mid = partition["first"], partition["end"], partition["mid"]
+    touched = partition["touched"]
+
+    while touched:
+        block = touched.pop()
+        j = mid[block]
+        if j == end[block]:
+            mid[block] = first[block]
+            continue
+
+        new_block = partition["count"]
+        partition["count"] += 1
+        if j - first[block] <= end[block] - j:
+            first[new_block], end[new_block] = first[block], j
+            first[block] = j
+        else:
+            first[new_block], end[new_block] = j, end[block]
+            end[block] = j
+        for i in range(first[new_block], end[new_block]):
+            set_of[elements[i]] = new_block
+        mid[block], mid[new_block] = first[block], first[new_block]
+
+# Function to minimize the DFA using Valmari and Lehtinen's algorithm
 def minimize_dfa(dfa):
-    partition = [set(dfa["accept_states"]), set(dfa["states"]) - set(dfa["accept_states"])]
-
-    while True:
-        new_partition = []
-        for group in partition:
-            subgroups = {}
-            for state in group:
-                key = tuple(dfa["transitions"].get((state, char)) for char in dfa["alphabet"])
-                if key not in subgroups:
-                    subgroups[key] = set()
-                subgroups[key].add(state)
-            new_partition.extend(subgroups.values())
-        
-        if new_partition == partition:
-            break
-        partition = new_partition
-
-    state_map = {frozenset(group): f"M{idx}" for idx, group in enumerate(partition)}
+    alphabet = dfa["alphabet"]
+    accept_states = dfa["accept_states"]
+
+    predecessors = defaultdict(list)
+    for (state, char), target in dfa["transitions"].items():
+        predecessors[target].append(state)
+
+    # Shortest distance to an accept state, states that cannot reach one are left out
+    distance = {state: 0 for state in accept_states}
+    queue = deque(distance)
+    while queue:
+        target = queue.popleft()
+        for state in predecessors[target]:
+            if state not in distance:
+                distance[state] = distance[target] + 1
+                queue.append(state)
+
+    if dfa["start_state"] not in distance:
+        return {
+            "states": {"M0"},
+            "alphabet": alphabet,
+            "transitions": {},
+            "start_state": "M0",
+            "accept_states": set()
+        }
+
+    states = list(distance)
+    state_idx = {state: idx for idx, state in enumerate(states)}
+    symbols = list(alphabet)
+    symbol_idx = {char: idx for idx, char in enumerate(symbols)}
+
+    tails, labels, heads = array("i"), array("i"), array("i")
+    by_label = defaultdict(list)
+    for (state, char), target in dfa["transitions"].items():
+        if target in distance:
+            by_label[char].append(len(tails))
+            tails.append(state_idx[state])
+            labels.append(symbol_idx[char])
+            heads.append(state_idx[target])
+
+    # States at different distances are distinguishable, so blocks start grouped by distance
+    groups = defaultdict(list)
+    for state, dist in distance.items():
+        groups[dist].append(state_idx[state])
+
+    blocks = make_partition(len(states))
+    for group in sorted(groups.values(), key=len, reverse=True)[1:]:
+        for state in group:
+            mark_element(blocks, state)
+        split_partition(blocks)
+
+    if blocks["count"] < len(states):
+        # Cords of transitions start grouped by label
+        cords = make_partition(len(tails))
+        for group in list(by_label.values())[1:]:
+            for transition in group:
+                mark_element(cords, transition)
+            split_partition(cords)
+
+        # Incoming transitions of every state
+        incoming_first = array("i", [0]) * (len(states) + 1)
+        for head in heads:
+            incoming_first[head + 1] += 1
+        for idx in range(len(states)):
+            incoming_first[idx + 1] += incoming_first[idx]
+        incoming = array("i", [0]) * len(tails)
+        fill = array("i", incoming_first)
+        for transition, head in enumerate(heads):
+            incoming[fill[head]] = transition
+            fill[head] += 1
+
+        block_elements, cord_elements = blocks["elements"], cords["elements"]
+        block, cord = 1, 0
+        while cord < cords["count"]:
+            for i in range(cords["first"][cord], cords["end"][cord]):
+                mark_element(blocks, tails[cord_elements[i]])
+            split_partition(blocks)
+            cord += 1
+
+            while block < blocks["count"]:
+                for i in range(blocks["first"][block], blocks["end"][block]):
+                    state = block_elements[i]
+                    for j in range(incoming_first[state], incoming_first[state + 1]):
+                        mark_element(cords, incoming[j])
+                split_partition(cords)
+                block += 1
+
+    names = [f"M{idx}" for idx in range(blocks["count"])]
+    block_of, block_first, location = blocks["set_of"], blocks["first"], blocks["location"]
 
     min_dfa = {
-        "states": set(state_map.values()),
-        "alphabet": dfa["alphabet"],
+        "states": set(names),
+        "alphabet": alphabet,
         "transitions": {},
-        "start_state": state_map[frozenset([dfa["start_state"]])],
-        "accept_states": set(state_map[frozenset(group)] for group in partition if group & dfa["accept_states"])
+        "start_state": names[block_of[state_idx[dfa["start_state"]]]],
+        "accept_states": set(names[block_of[state_idx[state]]] for state in accept_states)
     }
 
-    for group in partition:
-        representative = next(iter(group))
-        for char in dfa["alphabet"]:
-            target = dfa["transitions"].get((representative, char))
-            if target:
-                min_dfa["transitions"][(state_map[frozenset(group)], char)] = state_map[frozenset([t for t in partition if target in t][0])]
+    # Transitions of the first state of every block represent the block
+    for transition, tail in enumerate(tails):
+        if location[tail] == block_first[block_of[tail]]:
+            name = names[block_of[tail]]
+            min_dfa["transitions"][(name, symbols[labels[transition]])] = names[block_of[heads[transition]]]
 
     return min_dfa
 
+# Function to run the whole conversion
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def build_pipeline(grammar_text):
+    ndfa = grammar_to_ndfa(grammar_text)
+    dfa = ndfa_to_dfa(ndfa)
+    return ndfa, dfa, minimize_dfa(prune_unreachable(dfa))
+
+# Function to build a string recognizer specialized to the DFA's transition table
+def compile_recognizer(dfa):
+    state_idx = {state: idx for idx, state in enumerate(dfa["states"])}
+    char_idx = {char: idx for idx, char in enumerate(sorted(dfa["alphabet"]))}
+    width = max(len(char_idx), 1)
+
+    table = array("i", [-1]) * (len(state_idx) * width)
+    for (state, char), target in dfa["transitions"].items():
+        table[state_idx[state] * width + char_idx[char]] = state_idx[target] * width
+    accepting = tuple(state in dfa["accept_states"] for state in state_idx)
+    start = state_idx[dfa["start_state"]] * width
+
+    def recognize(string):
+        row = start
+        for char in string:
+            column = char_idx.get(char)
+            if column is None:
+                return False
+            row = table[row + column]
+            if row < 0:
+                return False
+        return accepting[row // width]
+
+    return recognize
+
+# Function to convert an automaton to JSON text
+def automaton_to_json(automaton):
+    transitions = {}
+    for (state, char), target in automaton["transitions"].items():
+        transitions[f"{state}, {char}"] = sorted(map(str, target)) if isinstance(target, set) else str(target)
+
+    return json.dumps({
+        "states": sorted(map(str, automaton["states"])),
+        "alphabet": sorted(automaton["alphabet"]),
+        "transitions": transitions,
+        "start_state": str(automaton["start_state"]),
+        "accept_states": sorted(map(str, automaton["accept_states"]))
+    })
+
 # Function to visualize the NDFA or DFA
 def visualize_automaton(automaton, title):
+    import graphviz
+
     dot = graphviz.Digraph(comment=title)
 
     # Adding states
-    for state in automaton["states"]:
-        if state in automaton["accept_states"]:
-            dot.node(str(state), str(state), shape='doublecircle')
-        else:
-            dot.node(str(state), str(state))
-    
-    # Adjust the transition visualization logic
-    for key, end in automaton["transitions"].items():
-        if isinstance(key, tuple) and len(key) == 2:
-            start, char = key
-        else:
-            start = key  # Handle single-item keys
-            char = ''    # Default or empty label for single-item keys
-        dot.edge(str(start), str(end), label=char)
+    accept_states = automaton["accept_states"]
+    for state in accept_states:
+        dot.node(str(state), str(state), shape='doublecircle')
+    for state in automaton["states"] - accept_states:
+        dot.node(str(state), str(state))
+
+    # Adding transitions, one edge per pair of states
+    edges = defaultdict(list)
+    for (start, char), end in automaton["transitions"].items():
+        targets = end if isinstance(end, set) else [end]
+        for target in targets:
+            edges[(start, target)].append(char)
+
+    for (start, end), chars in edges.items():
+        dot.edge(str(start), str(end), label=",".join(sorted(chars)))
 
     return dot
 
 
-# Streamlit UI
-st.title("Grammar to DFA/NDFA Minimization Tool")
-
-# Initialize session state for grammar and results
-if 'grammar_input' not in st.session_state:
-    st.session_state.grammar_input = "S -> aS | bS | ε"
-if 'ndfa' not in st.session_state:
-    st.session_state.ndfa = {}
-if 'dfa' not in st.session_state:
-    st.session_state.dfa = {}
-if 'minimized_dfa' not in st.session_state:
-    st.session_state.minimized_dfa = {}
-if 'test_result' not in st.session_state:
-    st.session_state.test_result = ""
-
-grammar_input = st.text_area("Enter your grammar (in BNF format, separate productions with colons):", st.session_state.grammar_input, height=150)
-
-new_production = st.text_input("Enter new production (e.g., A -> aA | b):")
-if st.button("Add Production"):
+# Function to build the graphs of the three automata
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner=False)
+def build_graphs(grammar_text):
+    ndfa, dfa, minimized_dfa = build_pipeline(grammar_text)
+    return (
+        visualize_automaton(ndfa, "NDFA"),
+        visualize_automaton(dfa, "DFA"),
+        visualize_automaton(minimized_dfa, "Minimized DFA")
+    )
+
+
+# Function to serialize the three automata
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def build_json(grammar_text):
+    return tuple(automaton_to_json(automaton) for automaton in build_pipeline(grammar_text))
+
+
+# Function to append the new production to the grammar
+def add_production():
+    new_production = st.session_state.new_production
     if new_production:
         if st.session_state.grammar_input.strip():
-            st.session_state.grammar_input += f": {new_production}"  
+            st.session_state.grammar_input += f": {new_production}"
         else:
             st.session_state.grammar_input = new_production
-        st.experimental_rerun()
-
-if st.button("Convert Grammar"):
-    grammar = grammar_input.strip()
-    
-    if grammar:
-        st.session_state.ndfa = grammar_to_ndfa(grammar)
-        st.subheader("NDFA")
-        st.json(st.session_state.ndfa)
-        st.graphviz_chart(visualize_automaton(st.session_state.ndfa, "NDFA"))
-
-        st.session_state.dfa = ndfa_to_dfa(st.session_state.ndfa)
-        st.subheader("DFA")
-        st.json(st.session_state.dfa)
-        st.graphviz_chart(visualize_automaton(st.session_state.dfa, "DFA"))
-
-        if st.session_state.dfa:
-            st.session_state.minimized_dfa = minimize_dfa(st.session_state.dfa)
-            st.subheader("Minimized DFA")
-            st.json(st.session_state.minimized_dfa)
-            st.graphviz_chart(visualize_automaton(st.session_state.minimized_dfa, "Minimized DFA"))
-
-test_string = st.text_input("Enter a string to test against the minimized DFA:", "")
-if st.button("Test String"):
-    if st.session_state.minimized_dfa:
-        current_state = st.session_state.minimized_dfa.get("start_state")
-        accepted = True
-
-        for char in test_string:
-            next_state = st.session_state.minimized_dfa["transitions"].get((current_state, char))
-            if next_state:
-                current_state = next_state
-            else:
-                accepted = False
-                break
 
-        if accepted and current_state in st.session_state.minimized_dfa["accept_states"]:
-            st.session_state.test_result = "The string is accepted by the DFA."
+
+# Streamlit UI
+def main():
+    st.title("Grammar to DFA/NDFA Minimization Tool")
+
+    # Initialize session state for grammar and results
+    if 'grammar_input' not in st.session_state:
+        st.session_state.grammar_input = "S -> aS | bS | ε"
+    if 'recognizer' not in st.session_state:
+        st.session_state.recognizer = None
+    if 'converted_grammar' not in st.session_state:
+        st.session_state.converted_grammar = None
+    if 'test_result' not in st.session_state:
+        st.session_state.test_result = ""
+
+    grammar_input = st.text_area("Enter your grammar (in BNF format, separate productions with colons):", st.session_state.grammar_input, height=150)
+
+    st.text_input("Enter new production (e.g., A -> aA | b):", key="new_production")
+    st.button("Add Production", on_click=add_production)
+
+    if st.button("Convert Grammar"):
+        grammar = grammar_input.strip()
+
+        if grammar:
+            try:
+                if st.session_state.converted_grammar != grammar:
+                    _, _, minimized_dfa = build_pipeline(grammar)
+                    st.session_state.recognizer = compile_recognizer(minimized_dfa)
+                    st.session_state.converted_grammar = grammar
+                ndfa_graph, dfa_graph, minimized_dfa_graph = build_graphs(grammar)
+                ndfa_json, dfa_json, minimized_dfa_json = build_json(grammar)
+            except ValueError as error:
+                st.session_state.recognizer = None
+                st.session_state.converted_grammar = None
+                st.error(f"Invalid grammar: {error}")
+            else:
+                st.subheader("NDFA")
+                st.json(ndfa_json)
+                st.graphviz_chart(ndfa_graph)
+
+                st.subheader("DFA")
+                st.json(dfa_json)
+                st.graphviz_chart(dfa_graph)
+
+                st.subheader("Minimized DFA")
+                st.json(minimized_dfa_json)
+                st.graphviz_chart(minimized_dfa_graph)
+
+    test_string = st.text_input("Enter a string to test against the minimized DFA:", "")
+    if st.button("Test String"):
+        if st.session_state.recognizer:
+            if st.session_state.recognizer(test_string):
+                st.session_state.test_result = "The string is accepted by the DFA."
+            else:
+                st.session_state.test_result = "The string is rejected by the DFA."
         else:
-            st.session_state.test_result = "The string is rejected by the DFA."
-    else:
-        st.session_state.test_result = "Please convert a valid grammar before testing strings."
+            st.session_state.test_result = "Please convert a valid grammar before testing strings."
+
+    if st.session_state.test_result:
+        st.success(st.session_state.test_result)
+
 
-if st.session_state.test_result:
-    st.success(st.session_state.test_result)
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,91 @@
+import json
+import re
 import streamlit as st
+from array import array
 from collections import defaultdict, deque
-import graphviz
+from itertools import count
 
 
+# Target state of productions that do not end with a non-terminal
+FINAL_STATE = "Final"
+
+# Symbol of the empty string, also the label of the moves made by unit productions
+EPSILON = "ε"
+
+# A stripped production option: ε alone, or terminals followed by at most one
+# non-terminal. Each space run can only be taken by one \s*, so a failing match
+# does not backtrack over it repeatedly
+OPTION_PATTERN = re.compile(r"(ε)|([a-z](?:\s*[a-z])*)?(?:\s*([A-Z]))?")
+
+# Left-hand side of a production, a single non-terminal. Generated state names
+# never match it, so they cannot collide with the grammar's own states
+NON_TERMINAL_PATTERN = re.compile(r"[A-Z]")
+
+# Grammars kept by each cache, the caches are shared by every session
+CACHE_ENTRIES = 32
+
 # Function to convert grammar to NDFA
 def grammar_to_ndfa(grammar):
     rules = grammar.split(":")  # Split productions by colon
     ndfa = {
         "states": set(),
         "alphabet": set(),
-        "transitions": defaultdict(set),
+        "transitions": defaultdict(set),  # (state, char) -> set of next states
         "start_state": None,
         "accept_states": set()
     }
 
-    # Parse each rule
+    # Parse each rule, blank ones are skipped
     for rule in rules:
-        if "->" in rule:
-            lhs, rhs = rule.split("->")
-            lhs = lhs.strip()
-            rhs_options = rhs.split("|")
-
-            ndfa["states"].add(lhs)
-            for option in rhs_options:
-                option = option.strip()
-                for char in option:
-                    if char.islower():  # Assuming lowercase letters are part of the alphabet
-                        ndfa["alphabet"].add(char)
-
-                # Create transitions for each option
-                for char in option:
-                    if char.islower():  # Only consider terminal characters
-                        ndfa["transitions"][lhs].add(char)
-                    elif char.isupper():  # Non-terminal character
-                        ndfa["transitions"][lhs].add(char)
-
-            # Treat epsilon (ε) as an accept state
-            if "ε" in option:
+        if not rule.strip():
+            continue
+        if "->" not in rule:
+            raise ValueError(f"Production '{rule.strip()}' has no '->'")
+
+        lhs, rhs = rule.split("->", 1)
+        lhs = lhs.strip()
+        if not NON_TERMINAL_PATTERN.fullmatch(lhs):
+            raise ValueError(f"Left-hand side '{lhs}' must be a single non-terminal")
+        if ndfa["start_state"] is None:  # The first LHS is the start state
+            ndfa["start_state"] = lhs
+        rhs_options = rhs.split("|")
+
+        ndfa["states"].add(lhs)
+        for option in rhs_options:
+            # Match the whole option in a single regex scan, anything else is an error
+            option = option.strip()
+            match = OPTION_PATTERN.fullmatch(option)
+            if match is None or not any(match.groups()):
+                raise ValueError(
+                    f"Option '{option}' of {lhs} must be ε, or terminals followed by at most one non-terminal"
+                )
+            epsilon, terminals, target = match.groups()
+
+            if epsilon:  # Treat epsilon (ε) as an accept state
                 ndfa["accept_states"].add(lhs)
-
-    ndfa["start_state"] = rules[0].split("->")[0].strip()  # Set the start state as the first LHS
+                continue
+
+            target = target or FINAL_STATE
+            ndfa["states"].add(target)
+            if not terminals:  # Unit production, an ε-move to the non-terminal
+                ndfa["transitions"][(lhs, EPSILON)].add(target)
+                continue
+
+            # Read the terminals from lhs to the target, intermediate states are named by the prefix read
+            terminals = "".join(terminals.split())
+            ndfa["alphabet"].update(terminals)
+            state = lhs
+            for idx, char in enumerate(terminals):
+                next_state = target if idx == len(terminals) - 1 else f"{lhs}_{terminals[:idx + 1]}"
+                ndfa["states"].add(next_state)
+                ndfa["transitions"][(state, char)].add(next_state)
+                state = next_state
+
+            if target == FINAL_STATE:
+                ndfa["accept_states"].add(FINAL_STATE)
+
+    if ndfa["start_state"] is None:
+        raise ValueError("Grammar has no productions")
 
     return ndfa
 
@@ -52,249 +98,489 @@ def ndfa_to_dfa(ndfa):
         "start_state": None,
         "accept_states": set()
     }
-    
+
+    # Number the NDFA states, subsets of them are handled as int bitmasks
+    nid = {state: idx for idx, state in enumerate(ndfa["states"] | {ndfa["start_state"]})}
+
+    # ε-closure of every NDFA state, the states reached through unit productions
+    epsilon_moves = defaultdict(list)
+    for (state, char), targets in ndfa["transitions"].items():
+        if char == EPSILON:
+            epsilon_moves[nid[state]].extend(nid[target] for target in targets)
+
+    closure = []
+    for idx in range(len(nid)):
+        mask = 1 << idx
+        stack = [idx]
+        while stack:
+            for target in epsilon_moves[stack.pop()]:
+                if not mask >> target & 1:
+                    mask |= 1 << target
+                    stack.append(target)
+        closure.append(mask)
+
+    # Successor mask of every NDFA state on every character, already closed under
+    # ε-moves so the subsets built from them need no closure of their own
+    succ = {char: [0] * len(nid) for char in dfa["alphabet"]}
+    for (state, char), targets in ndfa["transitions"].items():
+        if char != EPSILON:
+            mask = 0
+            for target in targets:
+                mask |= closure[nid[target]]
+            succ[char][nid[state]] = mask
+
+    accept_mask = 0
+    for state in ndfa["accept_states"]:
+        accept_mask |= 1 << nid[state]
+
     state_map = {}
-    new_state = frozenset([ndfa["start_state"]])
-    state_map[new_state] = 'Q0'
-    dfa["states"].add('Q0')
+    state_numbers = count()  # Numbers subsets in discovery order, independent of the dict sizes
+    new_state = closure[nid[ndfa["start_state"]]]
+    state_map[new_state] = f"Q{next(state_numbers)}"
+    dfa["states"].add(state_map[new_state])
 
     unprocessed_states = deque([new_state])
 
+    # Bind the containers and methods used in the loop to locals once
+    succ_items = list(succ.items())
+    state_map_get = state_map.get
+    add_state = dfa["states"].add
+    transitions = dfa["transitions"]
+    popleft = unprocessed_states.popleft
+    append = unprocessed_states.append
+
     while unprocessed_states:
-        current = unprocessed_states.popleft()
+        current = popleft()
         current_state_name = state_map[current]
 
-        for char in dfa["alphabet"]:
-            next_states = set()
-            for state in current:
-                if state in ndfa["transitions"] and char in ndfa["transitions"][state]:
-                    next_states.update(ndfa["transitions"][state])
-
-            if next_states:
-                next_state_name = frozenset(next_states)
-                if next_state_name not in state_map:
-                    dfa["states"].add(next_state_name)
-                    state_map[next_state_name] = f"Q{len(dfa['states'])}"
-                    unprocessed_states.append(next_state_name)
-                dfa["transitions"][(current_state_name, char)] = state_map[next_state_name]
+        for char, succ_char in succ_items:
+            # Union of the successors of every state in the subset, one set bit at a time
+            next_state = 0
+            remaining = current
+            while remaining:
+                next_state |= succ_char[(remaining & -remaining).bit_length() - 1]
+                remaining &= remaining - 1  # Clear the lowest set bit
+
+            if next_state:
+                next_state_name = state_map_get(next_state)  # Single lookup for known subsets
+                if next_state_name is None:
+                    next_state_name = state_map[next_state] = f"Q{next(state_numbers)}"
+                    add_state(next_state_name)
+                    append(next_state)
+                transitions[(current_state_name, char)] = next_state_name
 
     # Determine accepting states
-    for state in state_map.keys():
-        if any(s in ndfa["accept_states"] for s in state):
-            dfa["accept_states"].add(state_map[state])
+    for state, name in state_map.items():
+        if state & accept_mask:
+            dfa["accept_states"].add(name)
 
     dfa["start_state"] = 'Q0'  # Set the start state
 
     return dfa
 
-# Function to minimize the DFA using Myhill-Nerode theorem
+# Function to remove the states that cannot be reached from the start state
+def prune_unreachable(dfa):
+    reachable = {dfa["start_state"]}
+    queue = deque(reachable)
+    while queue:
+        state = queue.popleft()
+        for char in dfa["alphabet"]:
+            target = dfa["transitions"].get((state, char))
+            if target is not None and target not in reachable:
+                reachable.add(target)
+                queue.append(target)
+
+    if len(reachable) == len(dfa["states"]):
+        return dfa  # Nothing to remove
+
+    return {
+        "states": reachable,
+        "alphabet": dfa["alphabet"],
+        "transitions": {key: target for key, target in dfa["transitions"].items() if key[0] in reachable},
+        "start_state": dfa["start_state"],
+        "accept_states": dfa["accept_states"] & reachable
+    }
+
+# Function to create a refinable partition of range(size) holding a single set
+def make_partition(size):
+    partition = {
+        "count": 1 if size else 0,               # Number of sets
+        "elements": array("i", range(size)),     # Elements ordered so every set is contiguous
+        "location": array("i", range(size)),     # Position of every element in elements
+        "set_of": array("i", [0]) * size,        # Set every element belongs to
+        "first": array("i", [0]) * size,         # Start of every set in elements
+        "end": array("i", [0]) * size,           # End of every set in elements
+        "mid": array("i", [0]) * size,           # End of the marked prefix of every set
+        "touched": []                            # Sets with marked elements
+    }
+    if size:
+        partition["end"][0] = size
+    return partition
+
+# Function to move an element into the marked prefix of its set
+def mark_element(partition, element):
+    elements, location, mid = partition["elements"], partition["location"], partition["mid"]
+    block = partition["set_of"][element]
+    i, j = location[element], mid[block]
+    if i < j:
+        return  # Already marked
+
+    if j == partition["first"][block]:
+        partition["touched"].append(block)
+
+    # Swap the element with the first unmarked one
+    other = elements[j]
+    elements[i], location[other] = other, i
+    elements[j], location[element] = element, j
+    mid[block] = j + 1
+
+# Function to split every touched set into its marked and unmarked elements
+def split_partition(partition):
+    elements, set_of = partition["elements"], partition["set_of"]
+    first, end, mid = partition["first"], partition["end"], partition["mid"]
+    touched = partition["touched"]
+
+    while touched:
+        block = touched.pop()
+        j = mid[block]
+        if j == end[block]:
+            mid[block] = first[block]  # Every element was marked, nothing to split
+            continue
+
+        # The smaller part becomes the new set
+        new_block = partition["count"]
+        partition["count"] += 1
+        if j - first[block] <= end[block] - j:
+            first[new_block], end[new_block] = first[block], j
+            first[block] = j
+        else:
+            first[new_block], end[new_block] = j, end[block]
+            end[block] = j
+
+        for i in range(first[new_block], end[new_block]):
+            set_of[elements[i]] = new_block
+        mid[block], mid[new_block] = first[block], first[new_block]
+
+# Function to minimize the DFA using Valmari and Lehtinen's partition refinement
 def minimize_dfa(dfa):
-    partition = []
-    state_list = list(dfa["states"])
-    
-    # Initial partitioning
-    accepting = set(dfa["accept_states"])
-    non_accepting = set(state_list) - accepting
-    
-    if accepting:
-        partition.append(accepting)
-    if non_accepting:
-        partition.append(non_accepting)
-
-    # Split partitions until they are stable
-    while True:
-        new_partition = []
-        for part in partition:
-            part_list = list(part)
-            while part_list:
-                representative = part_list.pop()
-                same_group = {representative}
-                to_check = part_list.copy()
-                to_check.append(representative)
-
-                for state in to_check:
-                    if not are_distinguishable(dfa, representative, state):
-                        same_group.add(state)
-                
-                part_list = [s for s in part_list if s not in same_group]
-                new_partition.append(same_group)
-
-        if len(new_partition) == len(partition):
-            break
-        partition = new_partition
+    alphabet = dfa["alphabet"]
+    accepting = dfa["accept_states"]
+
+    predecessors = defaultdict(list)
+    for (state, char), target in dfa["transitions"].items():
+        predecessors[target].append(state)
+
+    # Shortest distance of every state to an accept state (backwards BFS). States
+    # from which no accept state can be reached are removed, otherwise a transition
+    # into such a state would be told apart from a missing one
+    distance = {state: 0 for state in accepting}
+    queue = deque(distance)
+    while queue:
+        target = queue.popleft()
+        for state in predecessors[target]:
+            if state not in distance:
+                distance[state] = distance[target] + 1
+                queue.append(state)
+
+    if dfa["start_state"] not in distance:
+        dead = frozenset(dfa["states"] - distance.keys())
+        return {
+            "states": {dead},
+            "alphabet": alphabet,
+            "transitions": {},
+            "start_state": dead,
+            "accept_states": set()
+        }
+
+    # Number states and symbols, transitions are stored as parallel arrays
+    states = list(distance)
+    state_idx = {state: idx for idx, state in enumerate(states)}
+    symbols = list(alphabet)
+    symbol_idx = {char: idx for idx, char in enumerate(symbols)}
+
+    tails, labels, heads = array("i"), array("i"), array("i")
+    by_label = defaultdict(list)
+    for (state, char), target in dfa["transitions"].items():
+        if target in distance:
+            by_label[char].append(len(tails))
+            tails.append(state_idx[state])
+            labels.append(symbol_idx[char])
+            heads.append(state_idx[target])
+
+    # Initial partitioning of the states by their distance: the shortest accepted
+    # word differs, so states at different distances are never equivalent. This
+    # also separates accepting (distance 0) from non-accepting states and saves
+    # the refinement most of its splits on chain shaped automata
+    groups = defaultdict(list)
+    for state, dist in distance.items():
+        groups[dist].append(state_idx[state])
+
+    blocks = make_partition(len(states))
+    for group in sorted(groups.values(), key=len, reverse=True)[1:]:  # Largest group stays in place
+        for state in group:
+            mark_element(blocks, state)
+        split_partition(blocks)
+
+    # Refinement can only split blocks, so it is skipped when the distances
+    # already tell every state apart
+    if blocks["count"] < len(states):
+        # Initial partitioning of the transitions (cords) by their label
+        cords = make_partition(len(tails))
+        for group in list(by_label.values())[1:]:
+            for transition in group:
+                mark_element(cords, transition)
+            split_partition(cords)
+
+        # Incoming transitions of every state, incoming[incoming_first[q]:incoming_first[q + 1]]
+        incoming_first = array("i", [0]) * (len(states) + 1)
+        for head in heads:
+            incoming_first[head + 1] += 1
+        for idx in range(len(states)):
+            incoming_first[idx + 1] += incoming_first[idx]
+        incoming = array("i", [0]) * len(tails)
+        fill = array("i", incoming_first)
+        for transition, head in enumerate(heads):
+            incoming[fill[head]] = transition
+            fill[head] += 1
+
+        # Split blocks by the tails of every cord, and cords by the heads of every new block
+        block_elements, cord_elements = blocks["elements"], cords["elements"]
+        block, cord = 1, 0
+        while cord < cords["count"]:
+            for i in range(cords["first"][cord], cords["end"][cord]):
+                mark_element(blocks, tails[cord_elements[i]])
+            split_partition(blocks)
+            cord += 1
+
+            while block < blocks["count"]:
+                for i in range(blocks["first"][block], blocks["end"][block]):
+                    state = block_elements[i]
+                    for j in range(incoming_first[state], incoming_first[state + 1]):
+                        mark_element(cords, incoming[j])
+                split_partition(cords)
+                block += 1
 
     # Build minimized DFA
+    block_of, block_first, location = blocks["set_of"], blocks["first"], blocks["location"]
+    block_elements = blocks["elements"]
+    part_names = [
+        frozenset(states[block_elements[i]] for i in range(block_first[idx], blocks["end"][idx]))
+        for idx in range(blocks["count"])
+    ]
     min_dfa = {
-        "states": set(),
-        "alphabet": dfa["alphabet"],
+        "states": set(part_names),
+        "alphabet": alphabet,
         "transitions": {},
-        "start_state": None,
-        "accept_states": set()
+        "start_state": part_names[block_of[state_idx[dfa["start_state"]]]],
+        "accept_states": {part_names[block_of[state_idx[state]]] for state in accepting}
     }
-    
-    state_map = {}
-    for part in partition:
-        part_name = frozenset(part)
-        min_dfa["states"].add(part_name)
-        if dfa["start_state"] in part:
-            min_dfa["start_state"] = part_name
-        if any(s in dfa["accept_states"] for s in part):
-            min_dfa["accept_states"].add(part_name)
-    
-    # Create transitions
-    for part in partition:
-        part_name = frozenset(part)
-        for char in dfa["alphabet"]:
-            next_states = set()
-            for state in part:
-                if (state, char) in dfa["transitions"]:
-                    next_states.add(dfa["transitions"][(state, char)])
 
-            if next_states:
-                next_part = next((p for p in partition if next_states & p), None)
-                if next_part:
-                    min_dfa["transitions"][(part_name, char)] = frozenset(next_part)
+    # Create transitions from the first state of every block
+    for transition, tail in enumerate(tails):
+        if location[tail] == block_first[block_of[tail]]:
+            part_name = part_names[block_of[tail]]
+            min_dfa["transitions"][(part_name, symbols[labels[transition]])] = part_names[block_of[heads[transition]]]
 
     return min_dfa
 
-def are_distinguishable(dfa, state1, state2):
-    """Check if two states are distinguishable in the given DFA."""
-    for char in dfa["alphabet"]:
-        next1 = dfa["transitions"].get((state1, char))
-        next2 = dfa["transitions"].get((state2, char))
-        
-        if next1 != next2:
-            return True
-    return False
+# Function to run the whole conversion, cached on the grammar text so reruns skip it
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def build_pipeline(grammar_text):
+    ndfa = grammar_to_ndfa(grammar_text)
+    dfa = ndfa_to_dfa(ndfa)
+    return ndfa, dfa, minimize_dfa(prune_unreachable(dfa))
+
+# Function to build a string recognizer specialized to the DFA's transition table
+def compile_recognizer(dfa):
+    # Dense row-major table over state and character indices. Entries hold the
+    # offset of the next state's row, so a step is one add and one load; -1
+    # marks a missing transition
+    state_idx = {state: idx for idx, state in enumerate(dfa["states"])}
+    char_idx = {char: idx for idx, char in enumerate(sorted(dfa["alphabet"]))}
+    width = max(len(char_idx), 1)
+
+    table = array("i", [-1]) * (len(state_idx) * width)
+    for (state, char), target in dfa["transitions"].items():
+        table[state_idx[state] * width + char_idx[char]] = state_idx[target] * width
+    accepting = tuple(state in dfa["accept_states"] for state in state_idx)
+    start = state_idx[dfa["start_state"]] * width
+
+    def recognize(string):
+        row = start
+        for char in string:
+            column = char_idx.get(char)
+            if column is None:
+                return False  # Character outside the alphabet
+            row = table[row + column]
+            if row < 0:
+                return False  # No valid transition exists
+        return accepting[row // width]
+
+    return recognize
+
+# Function to convert an automaton to JSON text. Sets become sorted lists and
+# transition keys "state, char" strings, which st.json can show without warnings
+def automaton_to_json(automaton):
+    transitions = {}
+    for (state, char), target in automaton["transitions"].items():
+        transitions[f"{state}, {char}"] = sorted(map(str, target)) if isinstance(target, set) else str(target)
+
+    return json.dumps({
+        "states": sorted(map(str, automaton["states"])),
+        "alphabet": sorted(automaton["alphabet"]),
+        "transitions": transitions,
+        "start_state": str(automaton["start_state"]),
+        "accept_states": sorted(map(str, automaton["accept_states"]))
+    })
 
 # Function to visualize the NDFA or DFA
 def visualize_automaton(automaton, title):
+    import graphviz  # Only needed when rendering
+
     dot = graphviz.Digraph(comment=title)
 
-    # Adding states
-    for state in automaton["states"]:
-        if state in automaton["accept_states"]:
-            dot.node(str(state), str(state), shape='doublecircle')
-        else:
-            dot.node(str(state), str(state))
-    
-    # Adjust the transition visualization logic
-    for key, end in automaton["transitions"].items():
-        if isinstance(key, tuple) and len(key) == 2:
-            start, char = key
-        else:
-            start = key  # Handle single-item keys
-            char = ''    # Default or empty label for single-item keys
-        dot.edge(str(start), str(end), label=char)
+    # Adding states, accepting ones first
+    accept_states = automaton["accept_states"]
+    for state in accept_states:
+        dot.node(str(state), str(state), shape='doublecircle')
+    for state in automaton["states"] - accept_states:
+        dot.node(str(state), str(state))
+
+    # Adding transitions, NDFA transitions lead to a set of states. Parallel
+    # transitions between two states are drawn as one edge listing every char
+    edges = defaultdict(list)
+    for (start, char), end in automaton["transitions"].items():
+        targets = end if isinstance(end, set) else [end]
+        for target in targets:
+            edges[(start, target)].append(char)
+
+    for (start, end), chars in edges.items():
+        dot.edge(str(start), str(end), label=",".join(sorted(chars)))
 
     return dot
 
 
-# Streamlit UI
-st.title("Grammar to DFA/NDFA Minimization Tool")
-
-# Initialize session state for grammar and results
-if 'grammar_input' not in st.session_state:
-    st.session_state.grammar_input = "S -> aS | bS | ε"
-if 'ndfa' not in st.session_state:
-    st.session_state.ndfa = {}
-if 'dfa' not in st.session_state:
-    st.session_state.dfa = {}
-if 'minimized_dfa' not in st.session_state:
-    st.session_state.minimized_dfa = {}
-if 'test_result' not in st.session_state:
-    st.session_state.test_result = ""
-
-# Input for grammar
-st.header("Grammar Input")
-grammar_input = st.text_area("Enter your grammar (in BNF format, separate productions with colons):", 
-                              st.session_state.grammar_input, height=150)
-
-# Display the entered grammar for rechecking
-st.subheader("Entered Grammar:")
-st.text(grammar_input)
-
-# Addition of new productions
-new_production = st.text_input("Enter new production (e.g., A -> aA | b):")
-if st.button("Add Production"):
+# Function to build the graphs of the three automata, shared across reruns and sessions
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner=False)
+def build_graphs(grammar_text):
+    ndfa, dfa, minimized_dfa = build_pipeline(grammar_text)
+    return (
+        visualize_automaton(ndfa, "NDFA"),
+        visualize_automaton(dfa, "DFA"),
+        visualize_automaton(minimized_dfa, "Minimized DFA")
+    )
+
+
+# Function to serialize the three automata once per grammar, st.json then
+# passes the text through unchanged on every rerun
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def build_json(grammar_text):
+    return tuple(automaton_to_json(automaton) for automaton in build_pipeline(grammar_text))
+
+
+# Function to append the new production to the grammar, runs before the rerun of the button click
+def add_production():
+    new_production = st.session_state.new_production
     if new_production:
         # Append new production with colon separator
         if st.session_state.grammar_input.strip():
-            st.session_state.grammar_input += f": {new_production}"  
+            st.session_state.grammar_input += f": {new_production}"
         else:
             st.session_state.grammar_input = new_production  # For the first production
+
+
+# Streamlit UI
+def main():
+    st.title("Grammar to DFA/NDFA Minimization Tool")
+
+    # Initialize session state for grammar and results
+    if 'grammar_input' not in st.session_state:
+        st.session_state.grammar_input = "S -> aS | bS | ε"
+    if 'recognizer' not in st.session_state:
+        st.session_state.recognizer = None
+    if 'converted_grammar' not in st.session_state:
+        st.session_state.converted_grammar = None
+    if 'test_result' not in st.session_state:
+        st.session_state.test_result = ""
+
+    # Input for grammar
+    st.header("Grammar Input")
+    grammar_input = st.text_area("Enter your grammar (in BNF format, separate productions with colons):",
+                                  st.session_state.grammar_input, height=150)
+
+    # Display the entered grammar for rechecking
+    st.subheader("Entered Grammar:")
+    st.text(grammar_input)
+
+    # Addition of new productions
+    new_production = st.text_input("Enter new production (e.g., A -> aA | b):", key="new_production")
+    if st.button("Add Production", on_click=add_production) and new_production:
         st.success("Production added!")
-        st.experimental_rerun()  # Rerun to refresh the UI with updated grammar
-
-
-# Process input on button click
-if st.button("Convert Grammar"):
-    grammar = grammar_input.strip()
-    
-    if grammar:
-        # Convert grammar to NDFA
-        st.session_state.ndfa = grammar_to_ndfa(grammar)
-        st.subheader("Nondeterministic Finite Automaton (NDFA)")
-        st.json(st.session_state.ndfa)
-
-        # Visualize NDFA
-        ndfa_graph = visualize_automaton(st.session_state.ndfa, "NDFA")
-        st.graphviz_chart(ndfa_graph)
-
-        # Convert NDFA to DFA
-        st.session_state.dfa = ndfa_to_dfa(st.session_state.ndfa)
-        st.subheader("Deterministic Finite Automaton (DFA)")
-        st.json(st.session_state.dfa)
-
-        # Visualize DFA
-        dfa_graph = visualize_automaton(st.session_state.dfa, "DFA")
-        st.graphviz_chart(dfa_graph)
-
-        # Minimize DFA and visualize only if `dfa` is correctly created
-        if st.session_state.dfa:
-            st.session_state.minimized_dfa = minimize_dfa(st.session_state.dfa)
-            st.subheader("Minimized DFA")
-            st.json(st.session_state.minimized_dfa)
-
-            # Visualize minimized DFA
-            minimized_dfa_graph = visualize_automaton(st.session_state.minimized_dfa, "Minimized DFA")
-            st.graphviz_chart(minimized_dfa_graph)
-
-# String testing logic
-test_string = st.text_input("Enter a string to test against the minimized DFA:", "")
-if st.button("Test String"):
-    if st.session_state.minimized_dfa:
-        current_state = st.session_state.minimized_dfa.get("start_state")
-        accepted = True
-
-        # Process each character in the test string
-        for char in test_string:
-            next_state = st.session_state.minimized_dfa["transitions"].get((current_state, char))
-            if next_state:
-                current_state = next_state  # Move to the next state
+
+    # Process input on button click
+    if st.button("Convert Grammar"):
+        grammar = grammar_input.strip()
+
+        if grammar:
+            try:
+                # Convert the grammar in one cached call and compile its minimized DFA, only if it changed.
+                # Graphs and JSON come from their own caches, so the session keeps only the recognizer
+                if st.session_state.converted_grammar != grammar:
+                    _, _, minimized_dfa = build_pipeline(grammar)
+                    st.session_state.recognizer = compile_recognizer(minimized_dfa)
+                    st.session_state.converted_grammar = grammar
+                ndfa_graph, dfa_graph, minimized_dfa_graph = build_graphs(grammar)
+                ndfa_json, dfa_json, minimized_dfa_json = build_json(grammar)
+            except ValueError as error:
+                # Forget the last conversion so strings are not tested against it
+                st.session_state.recognizer = None
+                st.session_state.converted_grammar = None
+                st.error(f"Invalid grammar: {error}")
             else:
-                accepted = False
-                break  # Break if no valid transition exists
+                st.subheader("Nondeterministic Finite Automaton (NDFA)")
+                st.json(ndfa_json)
 
-        # Check if the final state is an accept state
-        if accepted and current_state in st.session_state.minimized_dfa["accept_states"]:
-            st.session_state.test_result = "The string is accepted by the DFA."
-        else:
-            st.session_state.test_result = "The string is rejected by the DFA."
-    else:
-        st.session_state.test_result = "Please convert a valid grammar before testing strings."
+                # Visualize NDFA
+                st.graphviz_chart(ndfa_graph)
+
+                st.subheader("Deterministic Finite Automaton (DFA)")
+                st.json(dfa_json)
+
+                # Visualize DFA
+                st.graphviz_chart(dfa_graph)
 
-# Display the test result
-if st.session_state.test_result:
-    st.success(st.session_state.test_result)
+                st.subheader("Minimized DFA")
+                st.json(minimized_dfa_json)
 
+                # Visualize minimized DFA
+                st.graphviz_chart(minimized_dfa_graph)
 
-# Notes for implementation details
-st.markdown("""
+    # String testing logic
+    test_string = st.text_input("Enter a string to test against the minimized DFA:", "")
+    if st.button("Test String"):
+        if st.session_state.recognizer:
+            # Run the recognizer compiled for the minimized DFA
+            if st.session_state.recognizer(test_string):
+                st.session_state.test_result = "The string is accepted by the DFA."
+            else:
+                st.session_state.test_result = "The string is rejected by the DFA."
+        else:
+            st.session_state.test_result = "Please convert a valid grammar before testing strings."
+
+    # Display the test result
+    if st.session_state.test_result:
+        st.success(st.session_state.test_result)
+
+    # Notes for implementation details
+    st.markdown("""
 ### Implementation Details:
 - *NDFA Conversion*: The application converts input BNF grammar to a nondeterministic finite automaton (NDFA).
 - *DFA Conversion*: The NDFA is converted to a deterministic finite automaton (DFA) using subset construction.
-- *Minimization*: The DFA is minimized using the Myhill-Nerode theorem.
+- *Minimization*: The DFA is minimized with Valmari and Lehtinen's partition refinement, which works on partial transition functions.
 - *Visualization*: Automata are visualized using Graphviz for easy understanding.
 - *String Testing*: Users can input strings to test against the minimized DFA.
-""")
\ No newline at end of file
+""")
+
+
+if __name__ == "__main__":
+    main()